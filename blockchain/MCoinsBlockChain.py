@@ -1,34 +1,100 @@
 # MCoinsBlockChain.py
+import functools
 import hashlib
-import json
 import time
 import os
+import queue
+import re
 import secrets
-from typing import Dict, Any, List, Tuple
+import struct
+import threading
+from array import array
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from collections.abc import MutableMapping
+from typing import Dict, Any, List, Optional, Tuple
+import orjson
 from ecdsa import SigningKey, SECP256k1, VerifyingKey, BadSignatureError
+from ecdsa.util import sigencode_der
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+
+try:
+    from coincurve import PublicKey as FastPublicKey  # libsecp256k1
+except ImportError:
+    FastPublicKey = None
 
 # -------------------------------
 # Configuración y persistencia
 # -------------------------------
 DATA_DIR = "."
 FOUNDER_WALLET_FILE = os.path.join(DATA_DIR, "GenWallet_wallet.json")
+CHAIN_LOG_FILE = os.path.join(DATA_DIR, "DCUP_chain.log")
+CHECKPOINT_FILE = os.path.join(DATA_DIR, "DCUP_checkpoint.json")
+CHECKPOINT_INTERVAL = 100  # bloques entre volcados de balances/coleccionables
+# Formato anterior (cadena completa reescrita en cada bloque); solo se lee para migrar
 CHAIN_FILE = os.path.join(DATA_DIR, "DCUP_chain.json")
 BALANCES_FILE = os.path.join(DATA_DIR, "DCUP_balances.json")
 COLLECTIBLES_FILE = os.path.join(DATA_DIR, "DCUP_collectibles.json")
 SUPPLY_TOTAL = 100_000_000
+PUBKEY_HEX_LEN = 128     # punto SECP256k1 sin comprimir (x||y), 64 bytes
+SIGNATURE_HEX_LEN = 128  # firma r||s de python-ecdsa, 64 bytes
+MAX_AMOUNT = 2**63 - 1   # los balances se guardan como int64 (ver BalanceTable)
+
+# -------------------------------
+# Hashing
+# -------------------------------
+# hashlib delega en OpenSSL, que ya selecciona en tiempo de ejecución la
+# implementación con extensiones SHA (SHA-NI) o AVX2 según la CPU.
+_sha256 = hashlib.sha256
+
+def sha256(data: bytes) -> bytes:
+    return _sha256(data).digest()
+
+def batch_sha256(inputs: List[bytes]) -> List[bytes]:
+    # Un solo recorrido sobre el lote; las entradas repetidas se hashean una vez
+    digests: Dict[bytes, bytes] = {}
+    for data in inputs:
+        if data not in digests:
+            digests[data] = _sha256(data).digest()
+    return [digests[data] for data in inputs]
+
+def _field_bytes(value) -> bytes:
+    # Todo valor (también las cadenas, que van entre comillas) en JSON canónico:
+    # así el tipo queda codificado y "5" no serializa igual que 5
+    data = orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return struct.pack(">I", len(data)) + data
+
+def canonical_tx_bytes(tx: Dict[str, Any]) -> bytes:
+    # Campos ordenados, con tipo y prefijo de longitud: dos tx distintas nunca serializan igual
+    parts = [struct.pack(">I", len(tx))]
+    for key in sorted(tx):
+        parts.append(_field_bytes(key))
+        parts.append(_field_bytes(tx[key]))
+    return b"".join(parts)
+
+def block_hash(index: int, timestamp: float, prev_hash: str, transactions: List[Dict[str, Any]]) -> str:
+    # Se alimenta el hash por partes en lugar de serializar el bloque entero a JSON
+    h = _sha256()
+    h.update(struct.pack(">QQI", index, int(timestamp * 1_000_000), len(transactions)))
+    h.update(prev_hash.encode())
+    for tx in transactions:
+        h.update(canonical_tx_bytes(tx))
+    return h.hexdigest()
 
 # -------------------------------
 # Lista de palabras para mnemónica
 # -------------------------------
-WORDLIST = [
+# 32 palabras (potencia de 2): cada palabra consume exactamente 5 bits de entropía
+WORDLIST = (
     "cactus","river","moon","light","echo","stone","forest","rapid","silver","delta","vapor","matrix",
     "ember","tropic","saffron","quartz","lumen","fenix","aurora","bridge","pixel","drift","nova",
-    "liber","origin","vault","chain","genesis","crypto"
-]
+    "liber","origin","vault","chain","genesis","crypto","orbit","prism","zenith"
+)
 
 def generate_mnemonic(n: int = 12) -> str:
-    return " ".join(secrets.choice(WORDLIST) for _ in range(n))
+    # Una sola lectura de entropía para toda la frase, sin sesgo de módulo
+    bits = int.from_bytes(secrets.token_bytes((5 * n + 7) // 8), "big")
+    return " ".join(WORDLIST[(bits >> (5 * i)) & 0x1f] for i in range(n))
 
 # -------------------------------
 # Clase Wallet
@@ -36,10 +102,10 @@ def generate_mnemonic(n: int = 12) -> str:
 class Wallet:
     def __init__(self, mnemonic: str = None):
         self.mnemonic = mnemonic or generate_mnemonic(12)
-        seed = hashlib.sha256(self.mnemonic.encode()).digest()
+        seed = sha256(self.mnemonic.encode())
         self.private_key = SigningKey.from_string(seed, curve=SECP256k1)
         self.public_key = self.private_key.get_verifying_key()
-        self.address = hashlib.sha256(self.public_key.to_string()).hexdigest()
+        self.address = sha256(self.public_key.to_string()).hex()
 
     def sign(self, from_addr: str, to_addr: str, amount: int) -> str:
         message = f"{from_addr}{to_addr}{amount}"
@@ -57,78 +123,311 @@ class Wallet:
 # -------------------------------
 # Utilidades
 # -------------------------------
-def is_hex(s: str) -> bool:
-    try:
-        bytes.fromhex(s)
-        return True
-    except Exception:
+_HEX_RE = re.compile(r"(?:[0-9a-fA-F]{2})*")
+
+def is_hex(s: str, length: int = None) -> bool:
+    # Regex precompilada: sin reservar bytes ni lanzar excepciones en el caso inválido
+    if not isinstance(s, str) or (length is not None and len(s) != length):
         return False
+    return _HEX_RE.fullmatch(s) is not None
 
+@functools.lru_cache(maxsize=4096)
 def address_from_pubkey_hex(pubkey_hex: str) -> str:
-    return hashlib.sha256(bytes.fromhex(pubkey_hex)).hexdigest()
+    return sha256(bytes.fromhex(pubkey_hex)).hex()
+
+def addresses_from_pubkeys_hex(pubkeys_hex: List[str]) -> Dict[str, str]:
+    valid = [p for p in set(pubkeys_hex) if is_hex(p)]
+    digests = batch_sha256([bytes.fromhex(p) for p in valid])
+    return {p: d.hex() for p, d in zip(valid, digests)}
+
+def _sha1_digest32(message: bytes) -> bytes:
+    # python-ecdsa firma con SHA-1 por defecto; rellenar a 32 bytes conserva el mismo entero
+    return hashlib.sha1(message).digest().rjust(32, b"\0")
+
+@functools.lru_cache(maxsize=4096)
+def _parse_pubkey(pubkey_hex: str):
+    # Descomprimir y validar el punto es caro: se cachea por pubkey (los remitentes se repiten)
+    pubkey_bytes = bytes.fromhex(pubkey_hex)
+    if FastPublicKey is not None and len(pubkey_bytes) == 64:
+        return FastPublicKey(b"\x04" + pubkey_bytes)
+    return VerifyingKey.from_string(pubkey_bytes, curve=SECP256k1)
+
+def verify_signature(pubkey_hex: str, signature_hex: str, message: bytes) -> bool:
+    vk = _parse_pubkey(pubkey_hex)
+    signature = bytes.fromhex(signature_hex)
+
+    if FastPublicKey is not None and isinstance(vk, FastPublicKey):
+        if len(signature) != 64:
+            return False
+        # Firma r||s de python-ecdsa -> DER con s normalizado (libsecp256k1 exige low-S)
+        order = SECP256k1.order
+        r = int.from_bytes(signature[:32], "big")
+        s = int.from_bytes(signature[32:], "big")
+        if s > order // 2:
+            s = order - s
+        der = sigencode_der(r, s, order)
+        return vk.verify(der, message, hasher=_sha1_digest32)
+
+    try:
+        return vk.verify(signature, message)
+    except BadSignatureError:
+        return False
 
 def load_json(path: str, default):
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except Exception:
-            return default
-    return default
+    # Un solo open: si no existe (FileNotFoundError es un OSError) o está corrupto, default
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return default
+
+def save_json(path: str, data, indent: bool = True):
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None))
+
+_datasync = getattr(os, "fdatasync", os.fsync)
+
+def load_chain_log(path: str) -> List[Dict[str, Any]]:
+    # Una línea JSON por bloque; una última línea incompleta (caída a mitad de
+    # escritura) se descarta y se trunca para que el siguiente append sea válido
+    chain: List[Dict[str, Any]] = []
+    valid_size = 0
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                # Sin salto final el bloque no terminó de escribirse: también es incompleto
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    chain.append(orjson.loads(line))
+                except ValueError:
+                    break
+                valid_size += len(line)
+    except FileNotFoundError:
+        return chain
+    if os.path.getsize(path) != valid_size:
+        os.truncate(path, valid_size)
+    return chain
 
-def save_json(path: str, data):
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+# -------------------------------
+# Tabla de balances
+# -------------------------------
+class BalanceTable(MutableMapping):
+    """Saldos indexados por id entero: dirección -> id y un array contiguo de int64."""
+
+    def __init__(self, initial: Dict[str, int] = None):
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._values = array("q")
+        if initial:
+            self.update(initial)
+
+    def __getitem__(self, address: str) -> int:
+        return self._values[self._ids[address]]
+
+    def get(self, address: str, default: int = None) -> int:
+        idx = self._ids.get(address)
+        return default if idx is None else self._values[idx]
+
+    def __setitem__(self, address: str, value: int):
+        idx = self._ids.get(address)
+        if idx is None:
+            self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+            self._values.append(value)
+        else:
+            self._values[idx] = value
+
+    def __delitem__(self, address: str):
+        # Se mueve la última cuenta al hueco para mantener el array compacto
+        idx = self._ids.pop(address)
+        last_address = self._addresses.pop()
+        last_value = self._values.pop()
+        if idx < len(self._addresses):
+            self._addresses[idx] = last_address
+            self._values[idx] = last_value
+            self._ids[last_address] = idx
+
+    def __iter__(self):
+        return iter(self._addresses)
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def add(self, address: str, delta: int):
+        idx = self._ids.get(address)
+        if idx is None:
+            self[address] = delta
+        else:
+            self._values[idx] += delta
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(zip(self._addresses, self._values))
 
 # -------------------------------
 # Clase Blockchain
 # -------------------------------
 class Blockchain:
     def __init__(self):
-        self.chain: List[Dict[str, Any]] = load_json(CHAIN_FILE, [])
-        self.balances: Dict[str, int] = load_json(BALANCES_FILE, {})
-        self.collectibles: Dict[str, Dict[str, Any]] = load_json(COLLECTIBLES_FILE, {})
-
-    def _persist(self):
-        save_json(CHAIN_FILE, self.chain)
-        save_json(BALANCES_FILE, self.balances)
-        save_json(COLLECTIBLES_FILE, self.collectibles)
-
-    def verify_transaction(self, tx: Dict[str, Any]) -> Tuple[bool, str]:
+        self.lock = threading.Lock()
+        self.chain: List[Dict[str, Any]] = load_chain_log(CHAIN_LOG_FILE)
+        # Sin búfer: cada bloque es un write directo y un fallo no deja bytes pendientes
+        self._log = open(CHAIN_LOG_FILE, "ab", buffering=0)
+        self._log_size = os.fstat(self._log.fileno()).st_size
+
+        if not self.chain and os.path.exists(CHAIN_FILE):
+            self._migrate_legacy_files()
+
+        # Altura y hash de la punta se mantienen como escalares: sellar un bloque
+        # no necesita tocar la lista, que así puede dejar de vivir entera en memoria
+        self._height = len(self.chain)
+        self._tip_hash = self.chain[-1]['hash'] if self.chain else "0"
+
+        checkpoint = load_json(CHECKPOINT_FILE, None) or {}
+        height = checkpoint.get("height", 0)
+        self.balances = BalanceTable(checkpoint.get("balances", {}))
+        self.collectibles: Dict[str, Dict[str, Any]] = checkpoint.get("collectibles", {})
+
+        # Reaplicar los bloques posteriores al último checkpoint
+        for block in self.chain[height:]:
+            self._apply_transactions(block['transactions'], block['timestamp'])
+
+    def _migrate_legacy_files(self):
+        self.chain = load_json(CHAIN_FILE, [])
+        self._write_log(b"".join(orjson.dumps(block) + b"\n" for block in self.chain))
+        save_json(CHECKPOINT_FILE, {
+            "height": len(self.chain),
+            "balances": load_json(BALANCES_FILE, {}),
+            "collectibles": load_json(COLLECTIBLES_FILE, {})
+        }, indent=False)
+
+    def _write_log(self, data: bytes):
+        # Un único write + fdatasync por bloque: no hace falta volcar metadatos
+        # del inodo (mtime) para que el bloque sea durable. Si algo falla a mitad
+        # se trunca lo escrito para no dejar una línea parcial en el log
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[self._log.write(view):]
+            _datasync(self._log.fileno())
+        except BaseException:
+            os.ftruncate(self._log.fileno(), self._log_size)
+            raise
+        self._log_size += len(data)
+
+    def checkpoint(self):
+        # Escritura atómica: un checkpoint a medias nunca sustituye al anterior
+        tmp_path = CHECKPOINT_FILE + ".tmp"
+        save_json(tmp_path, {
+            "height": self._height,
+            "balances": self.balances.to_dict(),
+            "collectibles": self.collectibles
+        }, indent=False)
+        os.replace(tmp_path, CHECKPOINT_FILE)
+
+    def _capture(self, transactions: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # Valores previos de todo lo que tocan las tx, para poder deshacerlas
+        balances: Dict[str, Any] = {}
+        collectibles: Dict[str, Any] = {}
+        for tx in transactions:
+            if tx.get("type", "token") == "token":
+                for addr in (tx['from'], tx['to']):
+                    balances.setdefault(addr, self.balances.get(addr))
+            elif tx.get("type") in ("collectible_create", "collectible_transfer"):
+                cid = tx["id"]
+                if cid not in collectibles:
+                    current = self.collectibles.get(cid)
+                    collectibles[cid] = dict(current) if current is not None else None
+        return balances, collectibles
+
+    def _restore(self, saved: Tuple[Dict[str, Any], Dict[str, Any]]):
+        balances, collectibles = saved
+        for addr, value in balances.items():
+            if value is not None:
+                self.balances[addr] = value
+            elif addr in self.balances:
+                del self.balances[addr]
+        for cid, value in collectibles.items():
+            if value is not None:
+                self.collectibles[cid] = value
+            else:
+                self.collectibles.pop(cid, None)
+
+    def _apply_or_restore(self, transactions: List[Dict[str, Any]], timestamp: float):
+        saved = self._capture(transactions)
+        try:
+            self._apply_transactions(transactions, timestamp)
+        except BaseException:
+            self._restore(saved)
+            raise
+        return saved
+
+    def verify_transaction(self, tx: Dict[str, Any], derived_from: str = None) -> Tuple[bool, str]:
+        ok, msg = self._verify_stateless(tx, derived_from)
+        if not ok:
+            return ok, msg
+        return self._verify_state(tx)
+
+    def _verify_stateless(self, tx: Dict[str, Any], derived_from: str = None) -> Tuple[bool, str]:
+        # Formato, dirección y firma: no dependen del estado, se comprueban fuera del lock
         tx_type = tx.get("type", "token")
 
-        # Validación de tokens (no génesis)
-        if tx_type == "token" and tx['from'] != "GENESIS":
-            # Campos mínimos
+        # Campos de direcciones (también en génesis); la cantidad debe caber en int64
+        if tx_type == "token":
             if not isinstance(tx.get('from'), str) or not isinstance(tx.get('to'), str):
                 return False, "Campos 'from' y 'to' deben ser strings"
             if not isinstance(tx.get('amount'), int) or tx['amount'] <= 0:
                 return False, "El campo 'amount' debe ser un entero positivo"
-            if not isinstance(tx.get('pubkey'), str) or not is_hex(tx['pubkey']):
+            if tx['amount'] > MAX_AMOUNT:
+                return False, "El campo 'amount' excede el máximo permitido"
+
+        # Validación de tokens (no génesis)
+        if tx_type == "token" and tx.get('from') != "GENESIS":
+            if not is_hex(tx.get('pubkey'), PUBKEY_HEX_LEN):
                 return False, "El campo 'pubkey' debe ser un hex válido"
-            if not isinstance(tx.get('signature'), str) or not is_hex(tx['signature']):
+            if not is_hex(tx.get('signature'), SIGNATURE_HEX_LEN):
                 return False, "El campo 'signature' debe ser un hex válido"
 
             # Dirección derivada de pubkey
-            derived_from = address_from_pubkey_hex(tx['pubkey'])
+            if derived_from is None:
+                derived_from = address_from_pubkey_hex(tx['pubkey'])
             if derived_from != tx['from']:
                 return False, "La dirección 'from' no corresponde a la clave pública 'pubkey'"
 
-            # Saldo
-            if self.balances.get(tx['from'], 0) < tx['amount']:
-                return False, "Saldo insuficiente"
-
             # Firma
             try:
-                pubkey_bytes = bytes.fromhex(tx['pubkey'])
-                vk = VerifyingKey.from_string(pubkey_bytes, curve=SECP256k1)
                 message = f"{tx['from']}{tx['to']}{tx['amount']}"
-                vk.verify(bytes.fromhex(tx['signature']), message.encode())
-            except BadSignatureError:
-                return False, "Firma inválida"
+                if not verify_signature(tx['pubkey'], tx['signature'], message.encode()):
+                    return False, "Firma inválida"
             except Exception as e:
                 return False, f"Error verificando firma: {str(e)}"
 
+        # Coleccionables: tipos de id y propietarios
+        if tx_type in ("collectible_create", "collectible_transfer"):
+            if not isinstance(tx.get("id"), str) or not tx["id"]:
+                return False, "ID inválido"
+            if not isinstance(tx.get("to"), str) or not tx["to"]:
+                return False, "Propietario requerido"
+            if tx_type == "collectible_transfer" and not isinstance(tx.get("from"), str):
+                return False, "Campos 'from' y 'to' deben ser strings"
+
+        # El bloque se serializa con orjson: una tx no representable se rechaza aquí
+        try:
+            canonical_tx_bytes(tx)
+        except TypeError:
+            return False, "Transacción con valores no serializables"
+
+        return True, "OK"
+
+    def _verify_state(self, tx: Dict[str, Any]) -> Tuple[bool, str]:
+        # Comprobaciones contra balances/coleccionables: llamar con self.lock tomado
+        tx_type = tx.get("type", "token")
+
+        # Saldo
+        if tx_type == "token" and tx['from'] != "GENESIS":
+            if self.balances.get(tx['from'], 0) < tx['amount']:
+                return False, "Saldo insuficiente"
+
         # Validación de coleccionables
         if tx_type == "collectible_create":
             if not tx.get("id") or tx["id"] in self.collectibles:
@@ -146,29 +445,103 @@ class Blockchain:
         return True, "OK"
 
     def add_block(self, transactions: List[Dict[str, Any]]) -> str:
-        # Validar todas las transacciones
+        # Derivar de una vez las direcciones de todas las pubkeys del bloque
+        derived = addresses_from_pubkeys_hex([
+            tx['pubkey'] for tx in transactions
+            if tx.get("type", "token") == "token" and isinstance(tx.get('pubkey'), str)
+        ])
+
+        # Validar formato y firmas de todas las transacciones
         for tx in transactions:
-            ok, msg = self.verify_transaction(tx)
+            pubkey = tx.get('pubkey')
+            ok, msg = self._verify_stateless(tx, derived.get(pubkey) if isinstance(pubkey, str) else None)
             if not ok:
                 raise ValueError(msg)
 
+        # Validar contra el estado, sellar y aplicar de forma serializada
+        with self.lock:
+            for tx in transactions:
+                ok, msg = self._verify_state(tx)
+                if not ok:
+                    raise ValueError(msg)
+            timestamp = time.time()
+            saved = self._apply_or_restore(transactions, timestamp)
+            try:
+                return self._seal_block(transactions, timestamp)
+            except BaseException:
+                self._restore(saved)
+                raise
+
+    def add_verified_batch(self, transactions: List[Dict[str, Any]]) -> Tuple[Optional[str], List[Optional[str]]]:
+        # Las tx ya pasaron _verify_stateless. Cada una se valida contra el estado
+        # dejado por las anteriores del lote; las aceptadas van a un único bloque.
+        # Devuelve (hash del bloque o None, error por tx o None si fue aceptada)
+        # Si el sellado falla se deshace todo el lote: el estado nunca se adelanta al log
+        errors: List[Optional[str]] = []
+        accepted: List[Dict[str, Any]] = []
+        batch_saved: Tuple[Dict[str, Any], Dict[str, Any]] = ({}, {})
+        with self.lock:
+            timestamp = time.time()
+            for tx in transactions:
+                # Un fallo inesperado con una tx solo rechaza esa tx
+                try:
+                    ok, msg = self._verify_state(tx)
+                    if ok:
+                        saved = self._apply_or_restore([tx], timestamp)
+                except Exception as e:
+                    ok, msg = False, f"Error inesperado: {str(e)}"
+                if not ok:
+                    errors.append(msg)
+                    continue
+                for batch_part, tx_part in zip(batch_saved, saved):
+                    for key, value in tx_part.items():
+                        batch_part.setdefault(key, value)
+                accepted.append(tx)
+                errors.append(None)
+            if not accepted:
+                return None, errors
+            try:
+                return self._seal_block(accepted, timestamp), errors
+            except BaseException:
+                self._restore(batch_saved)
+                raise
+
+    def _seal_block(self, transactions: List[Dict[str, Any]], timestamp: float) -> str:
+        # Encadena y persiste transacciones ya aplicadas: llamar con self.lock tomado
         block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time.time(),
+            'index': self._height + 1,
+            'timestamp': timestamp,
             'transactions': transactions,
-            'prev_hash': self.chain[-1]['hash'] if self.chain else "0"
+            'prev_hash': self._tip_hash
         }
-        block_string = json.dumps(block, sort_keys=True).encode()
-        block['hash'] = hashlib.sha256(block_string).hexdigest()
+        block['hash'] = block_hash(block['index'], block['timestamp'], block['prev_hash'], transactions)
+
+        # Primero el log: si falla, cadena y altura en memoria no se han tocado
+        self._write_log(orjson.dumps(block) + b"\n")
+        self.chain.append(block)
+        self._height = block['index']
+        self._tip_hash = block['hash']
+
+        # El estado derivado se vuelca cada N bloques; si falla, el log basta para reconstruirlo
+        if self._height % CHECKPOINT_INTERVAL == 0:
+            try:
+                self.checkpoint()
+            except OSError as e:
+                print(f"No se pudo guardar el checkpoint: {e}")
+        return block['hash']
 
-        # Aplicar efectos de estado
+    def _apply_transactions(self, transactions: List[Dict[str, Any]], timestamp: float):
+        # Aplicar efectos de estado. Los movimientos de tokens se acumulan por
+        # dirección y se escriben una sola vez por cuenta al final del bloque
+        deltas: Dict[str, int] = {}
         for tx in transactions:
             tx_type = tx.get("type", "token")
 
             if tx_type == "token":
+                amount = tx['amount']
                 if tx['from'] != "GENESIS":
-                    self.balances[tx['from']] = self.balances.get(tx['from'], 0) - tx['amount']
-                self.balances[tx['to']] = self.balances.get(tx['to'], 0) + tx['amount']
+                    deltas[tx['from']] = deltas.get(tx['from'], 0) - amount
+                deltas[tx['to']] = deltas.get(tx['to'], 0) + amount
 
             elif tx_type == "collectible_create":
                 cid = tx["id"]
@@ -177,25 +550,126 @@ class Blockchain:
                     "name": tx.get("name"),
                     "owner": tx["to"],
                     "metadata": tx.get("metadata", {}),
-                    "timestamp": time.time()
+                    "timestamp": timestamp
                 }
 
             elif tx_type == "collectible_transfer":
                 cid = tx["id"]
                 self.collectibles[cid]["owner"] = tx["to"]
-                self.collectibles[cid]["timestamp"] = time.time()
+                self.collectibles[cid]["timestamp"] = timestamp
 
-        self.chain.append(block)
-        self._persist()
-        return block['hash']
+        for addr, delta in deltas.items():
+            self.balances.add(addr, delta)
 
     def export_chain(self) -> List[Dict[str, Any]]:
         return self.chain
 
+    def balance_of(self, address: str) -> int:
+        with self.lock:
+            return self.balances.get(address, 0)
+
+    def balances_snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return self.balances.to_dict()
+
+    def collectibles_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return dict(self.collectibles)
+
+# -------------------------------
+# Agrupación de transacciones en bloques
+# -------------------------------
+# Un hilo de fondo reúne hasta max_batch transacciones (o espera max_wait
+# segundos), deriva de una vez las direcciones de sus pubkeys, verifica firma y
+# formato y confirma las válidas en un solo bloque: el fsync y el encadenado se
+# pagan una vez por lote
+class BlockBatcher:
+    def __init__(self, chain: Blockchain, max_batch: int = 256, max_wait: float = 0.01,
+                 max_pending: int = 4096):
+        self.chain = chain
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending: "queue.Queue[Tuple[Dict[str, Any], Future]]" = queue.Queue(maxsize=max_pending)
+        self._worker = threading.Thread(target=self._run, name="block-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, tx: Dict[str, Any], timeout: float = 30) -> str:
+        future: Future = Future()
+        try:
+            self.pending.put((tx, future), timeout=timeout)
+        except queue.Full:
+            raise ValueError("Nodo saturado, reintenta más tarde")
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Si aún está en cola se cancela y no se aplicará; si el lote ya la
+            # está procesando, el resultado llega en breve y se devuelve el real
+            if future.cancel():
+                raise ValueError("Tiempo de espera agotado; la transacción no se aplicó")
+            return future.result()
+
+    def _drain(self) -> List[Tuple[Dict[str, Any], Future]]:
+        items = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _verify(self, items: List[Tuple[Dict[str, Any], Future]]) -> List[Tuple[Dict[str, Any], Future]]:
+        # Igual que add_block: un solo batch_sha256 para todas las pubkeys del lote
+        derived = addresses_from_pubkeys_hex([
+            tx['pubkey'] for tx, _ in items
+            if tx.get("type", "token") == "token" and isinstance(tx.get('pubkey'), str)
+        ])
+        valid = []
+        for tx, future in items:
+            pubkey = tx.get('pubkey')
+            try:
+                ok, msg = self.chain._verify_stateless(tx, derived.get(pubkey) if isinstance(pubkey, str) else None)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            if ok:
+                valid.append((tx, future))
+            else:
+                future.set_exception(ValueError(msg))
+        return valid
+
+    def _run(self):
+        while True:
+            # Las tx cuyo cliente ya desistió (future cancelado) no se aplican
+            items = [(tx, future) for tx, future in self._drain()
+                     if future.set_running_or_notify_cancel()]
+            items = self._verify(items)
+            if not items:
+                continue
+            try:
+                block_hash, errors = self.chain.add_verified_batch([tx for tx, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), error in zip(items, errors):
+                if error is None:
+                    future.set_result(block_hash)
+                else:
+                    future.set_exception(ValueError(error))
+
 # -------------------------------
 # Inicialización del fundador y génesis
 # -------------------------------
+# Derivar la clave del fundador cuesta una multiplicación escalar: se hace una vez por proceso
+_founder_wallet: Optional[Wallet] = None
+
 def ensure_founder_and_genesis(chain: Blockchain):
+    global _founder_wallet
+
     # Asegurar wallet del fundador
     if not os.path.exists(FOUNDER_WALLET_FILE):
         fundador = Wallet()
@@ -212,9 +686,10 @@ def ensure_founder_and_genesis(chain: Blockchain):
         else:
             fundador = Wallet(mnemonic=fundador_data['mnemonic'])
             fundador.address = fundador_data['address']
+    _founder_wallet = fundador
 
     # Crear génesis si la cadena está vacía
-    if len(chain.chain) == 0:
+    if chain._height == 0:
         genesis_tx = {
             'type': 'token',
             'from': "GENESIS",
@@ -225,15 +700,29 @@ def ensure_founder_and_genesis(chain: Blockchain):
         }
         chain.add_block([genesis_tx])
         chain.balances[fundador.address] = SUPPLY_TOTAL
-        chain._persist()
+        chain.checkpoint()
         print("Bloque génesis creado y suministro inicial asignado.")
 
 # -------------------------------
 # Servidor Flask
 # -------------------------------
+class OrjsonProvider(JSONProvider):
+    # jsonify y request.get_json() pasan por orjson en lugar del json estándar
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 chain = Blockchain()
 ensure_founder_and_genesis(chain)
+batcher = BlockBatcher(chain)
 
 @app.route("/", methods=['GET'])
 def home():
@@ -255,77 +744,87 @@ def get_chain():
 
 @app.route("/balance", methods=['GET'])
 def get_balance_all():
-    return jsonify(chain.balances), 200
+    return jsonify(chain.balances_snapshot()), 200
 
 # 🔹 Nuevo endpoint: balance por dirección
 @app.route("/balance/<address>", methods=['GET'])
 def get_balance_address(address: str):
-    balance = chain.balances.get(address, 0)
+    balance = chain.balance_of(address)
     return jsonify({"address": address, "balance": balance}), 200
 
 @app.route("/collectibles", methods=['GET'])
 def get_collectibles():
-    return jsonify(chain.collectibles), 200
+    return jsonify(chain.collectibles_snapshot()), 200
+
+# Campos obligatorios por tipo; los frozenset se construyen una vez al cargar
+# el módulo y la comprobación rápida es un único test de subconjunto en C
+TX_FIELDS = {
+    "token": ('from', 'to', 'amount', 'pubkey', 'signature'),
+    "collectible_create": ('id', 'to', 'name'),
+    "collectible_transfer": ('id', 'from', 'to'),
+}
+_TX_REQUIRED = {tx_type: frozenset(fields) for tx_type, fields in TX_FIELDS.items()}
+
+def missing_fields(tx_type: str, data: Dict[str, Any]) -> List[str]:
+    if _TX_REQUIRED[tx_type] <= data.keys():
+        return []
+    # Solo en el caso de error se recorre la lista para informar qué falta
+    return [k for k in TX_FIELDS[tx_type] if k not in data]
+
+def build_token_tx(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'token',
+        'from': data['from'],
+        'to': data['to'],
+        'amount': int(data['amount']),
+        'pubkey': data['pubkey'],
+        'signature': data['signature']
+    }
+
+def build_collectible_create_tx(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'collectible_create',
+        'id': data['id'],
+        'to': data['to'],
+        'name': data['name'],
+        'metadata': data.get('metadata', {})
+    }
+
+def build_collectible_transfer_tx(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'collectible_transfer',
+        'id': data['id'],
+        'from': data['from'],
+        'to': data['to']
+    }
+
+TX_BUILDERS = {
+    "token": build_token_tx,
+    "collectible_create": build_collectible_create_tx,
+    "collectible_transfer": build_collectible_transfer_tx,
+}
 
 @app.route("/transaction", methods=['POST'])
 def new_transaction():
     data = request.get_json() or {}
     tx_type = data.get("type", "token")
 
-    try:
-        if tx_type == "token":
-            required = ['from', 'to', 'amount', 'pubkey', 'signature']
-            missing = [k for k in required if k not in data]
-            if missing:
-                return jsonify({"status": "error", "message": f"Faltan campos: {', '.join(missing)}"}), 400
-
-            tx = {
-                'type': 'token',
-                'from': data['from'],
-                'to': data['to'],
-                'amount': int(data['amount']),
-                'pubkey': data['pubkey'],
-                'signature': data['signature']
-            }
-            block_hash = chain.add_block([tx])
-
-        elif tx_type == "collectible_create":
-            required = ['id', 'to', 'name']
-            missing = [k for k in required if k not in data]
-            if missing:
-                return jsonify({"status": "error", "message": f"Faltan campos: {', '.join(missing)}"}), 400
-
-            tx = {
-                'type': 'collectible_create',
-                'id': data['id'],
-                'to': data['to'],
-                'name': data['name'],
-                'metadata': data.get('metadata', {})
-            }
-            block_hash = chain.add_block([tx])
-
-        elif tx_type == "collectible_transfer":
-            required = ['id', 'from', 'to']
-            missing = [k for k in required if k not in data]
-            if missing:
-                return jsonify({"status": "error", "message": f"Faltan campos: {', '.join(missing)}"}), 400
-
-            tx = {
-                'type': 'collectible_transfer',
-                'id': data['id'],
-                'from': data['from'],
-                'to': data['to']
-            }
-            block_hash = chain.add_block([tx])
+    # Un tipo no hashable (lista, objeto) haría fallar el lookup del dict con un 500
+    build_tx = TX_BUILDERS.get(tx_type) if isinstance(tx_type, str) else None
+    if build_tx is None:
+        return jsonify({"status": "error", "message": "Tipo de transacción desconocido"}), 400
 
-        else:
-            return jsonify({"status": "error", "message": "Tipo de transacción desconocido"}), 400
+    missing = missing_fields(tx_type, data)
+    if missing:
+        return jsonify({"status": "error", "message": f"Faltan campos: {', '.join(missing)}"}), 400
 
+    try:
+        block_hash = batcher.submit(build_tx(data))
         return jsonify({
             "status": "success",
             "hash": block_hash,
-            "balances": chain.balances,
-            "collectibles": chain.collectibles
+            "balances": chain.balances_snapshot(),
+            "collectibles": chain.collectibles_snapshot()
         }), 201
 
     except ValueError as ve:
@@ -348,13 +847,10 @@ def fund_user():
     except Exception:
         return jsonify({"status": "error", "message": "Campo 'amount' debe ser entero positivo"}), 400
 
-    fundador_data = load_json(FOUNDER_WALLET_FILE, None)
-    if not fundador_data or 'mnemonic' not in fundador_data or 'address' not in fundador_data:
+    fundador = _founder_wallet
+    if fundador is None:
         return jsonify({"status": "error", "message": "Wallet del fundador no disponible"}), 500
 
-    fundador = Wallet(mnemonic=fundador_data["mnemonic"])
-    fundador.address = fundador_data["address"]
-
     signature = fundador.sign(fundador.address, to_addr, amount)
     tx = {
         "type": "token",
@@ -366,11 +862,11 @@ def fund_user():
     }
 
     try:
-        block_hash = chain.add_block([tx])
+        block_hash = batcher.submit(tx)
         return jsonify({
             "status": "success",
             "hash": block_hash,
-            "balances": chain.balances
+            "balances": chain.balances_snapshot()
         }), 201
     except ValueError as ve:
         return jsonify({"status": "error", "message": str(ve)}), 400
@@ -382,11 +878,5 @@ def fund_user():
 # -------------------------------
 if __name__ == "__main__":
     os.makedirs(DATA_DIR, exist_ok=True)
-    # Asegurar archivos base
-    if not os.path.exists(CHAIN_FILE):
-        save_json(CHAIN_FILE, [])
-    if not os.path.exists(BALANCES_FILE):
-        save_json(BALANCES_FILE, {})
-    if not os.path.exists(COLLECTIBLES_FILE):
-        save_json(COLLECTIBLES_FILE, {})
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Solo desarrollo local; en producción se sirve con gunicorn (ver Procfile.blockchain)
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
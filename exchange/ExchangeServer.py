@@ -1,21 +1,73 @@
 from flask import Flask, request, jsonify, send_from_directory
+from collections import OrderedDict
+from sortedcontainers import SortedDict
+import math
 import uuid
 import time
 import requests
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 app = Flask(__name__)
 
 # -------------------------------
 # Estado en memoria
 # -------------------------------
+# Cada lado del libro es un SortedDict precio -> OrderedDict id -> orden: la lista
+# doblemente enlazada del OrderedDict da el FIFO del nivel (prioridad
+# precio-tiempo) y permite quitar una orden por id en O(1). Las compras usan -precio como clave para que la mejor quede
+# primero. Los coleccionables tienen un libro por id.
 orderbook = {
-    "buy": [],
-    "sell": [],
-    "collectible_buy": [],
-    "collectible_sell": []
+    "buy": SortedDict(),
+    "sell": SortedDict(),
+    "collectible_buy": {},
+    "collectible_sell": {}
 }
 trades = []
+# Órdenes vivas por id (para cancelar sin recorrer el libro)
+open_orders = {}
+
+def is_valid_price(price):
+    # NaN/inf romperían el orden (y la búsqueda) de las claves del SortedDict
+    return math.isfinite(price) and price > 0
+
+def order_key(order):
+    return -order["price"] if order["type"].endswith("buy") else order["price"]
+
+def add_order(side, order):
+    side.setdefault(order_key(order), OrderedDict())[order["id"]] = order
+    open_orders[order["id"]] = order
+
+def remove_order(order):
+    # Quita la orden de su nivel de precio y limpia niveles/libros que queden vacíos
+    book = orderbook[order["type"]]
+    cid = order.get("collectible_id")
+    side = book[cid] if "collectible_id" in order else book
+    key = order_key(order)
+    level = side[key]
+    del level[order["id"]]
+    if not level:
+        del side[key]
+    if "collectible_id" in order and not side:
+        del book[cid]
+    open_orders.pop(order["id"], None)
+
+def best_order(side):
+    if not side:
+        return None
+    return next(iter(side.peekitem(0)[1].values()))
+
+def pop_best_order(side):
+    key, level = side.peekitem(0)
+    _, order = level.popitem(last=False)
+    if not level:
+        del side[key]
+    open_orders.pop(order["id"], None)
+    return order
+
+def side_orders(side):
+    return [o for level in side.values() for o in level.values()]
 
 # -------------------------------
 # URLs dinámicas (se configuran en Render)
@@ -23,6 +75,22 @@ trades = []
 WALLET_URL = os.environ.get("WALLET_URL", "http://127.0.0.1:5001/tx/send")
 COLLECTIBLE_URL = os.environ.get("COLLECTIBLE_URL", "http://127.0.0.1:5001")
 
+# -------------------------------
+# Cliente HTTP con conexiones persistentes
+# -------------------------------
+HTTP_TIMEOUT = (3.05, 10)  # (conexión, lectura) en segundos
+
+def make_session() -> requests.Session:
+    # Solo se reintentan fallos de conexión: un POST que llegó al servidor no se repite
+    retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.1)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+SESSION = make_session()
+
 # -------------------------------
 # Ruta raíz
 # -------------------------------
@@ -57,6 +125,10 @@ def create_order():
 
     if order_type not in ["buy", "sell"]:
         return jsonify({"status": "error", "message": "Tipo de orden inválido"}), 400
+    if not is_valid_price(price):
+        return jsonify({"status": "error", "message": "price debe ser un número positivo y finito"}), 400
+    if amount <= 0:
+        return jsonify({"status": "error", "message": "amount debe ser un entero positivo"}), 400
 
     order = {
         "id": str(uuid.uuid4()),
@@ -67,7 +139,7 @@ def create_order():
         "timestamp": time.time()
     }
 
-    orderbook[order_type].append(order)
+    add_order(orderbook[order_type], order)
     match_orders()
     return jsonify({"status": "success", "order": order}), 201
 
@@ -84,6 +156,10 @@ def create_collectible_order():
 
     if order_type not in ["collectible_buy", "collectible_sell"]:
         return jsonify({"status": "error", "message": "Tipo de orden inválido"}), 400
+    if not is_valid_price(price):
+        return jsonify({"status": "error", "message": "price debe ser un número positivo y finito"}), 400
+    if not isinstance(cid, str) or not cid:
+        return jsonify({"status": "error", "message": "id de coleccionable requerido"}), 400
 
     order = {
         "id": str(uuid.uuid4()),
@@ -94,24 +170,46 @@ def create_collectible_order():
         "timestamp": time.time()
     }
 
-    orderbook[order_type].append(order)
-    match_collectible_orders()
+    add_order(orderbook[order_type].setdefault(cid, SortedDict()), order)
+    match_collectible_orders(cid)
     return jsonify({"status": "success", "order": order}), 201
 
 # -------------------------------
 # Ver libro de órdenes
 # -------------------------------
+def collectible_orders(order_type):
+    return [o for side in orderbook[order_type].values() for o in side_orders(side)]
+
 @app.route("/orderbook", methods=["GET"])
 def get_orderbook():
-    return jsonify(orderbook), 200
+    return jsonify({
+        "buy": side_orders(orderbook["buy"]),
+        "sell": side_orders(orderbook["sell"]),
+        "collectible_buy": collectible_orders("collectible_buy"),
+        "collectible_sell": collectible_orders("collectible_sell")
+    }), 200
 
 @app.route("/collectible/orderbook", methods=["GET"])
 def get_collectible_orderbook():
     return jsonify({
-        "collectible_buy": orderbook["collectible_buy"],
-        "collectible_sell": orderbook["collectible_sell"]
+        "collectible_buy": collectible_orders("collectible_buy"),
+        "collectible_sell": collectible_orders("collectible_sell")
     }), 200
 
+# -------------------------------
+# Cancelar orden
+# -------------------------------
+@app.route("/order/<order_id>", methods=["DELETE"])
+def cancel_order(order_id):
+    data = request.get_json(silent=True) or {}
+    order = open_orders.get(order_id)
+    if order is None:
+        return jsonify({"status": "error", "message": "Orden no encontrada"}), 404
+    if data.get("user") != order["user"]:
+        return jsonify({"status": "error", "message": "Solo el creador puede cancelar la orden"}), 403
+    remove_order(order)
+    return jsonify({"status": "success", "order": order}), 200
+
 # -------------------------------
 # Ver trades ejecutados
 # -------------------------------
@@ -124,68 +222,82 @@ def get_trades():
 # -------------------------------
 def match_orders():
     global orderbook, trades
+    buys, sells = orderbook["buy"], orderbook["sell"]
+
+    # Emparejar la mejor compra con la mejor venta mientras los precios se crucen
+    while True:
+        buy, sell = best_order(buys), best_order(sells)
+        if buy is None or sell is None or buy["price"] < sell["price"]:
+            break
+        amount = min(buy["amount"], sell["amount"])
+        trade = {
+            "buy_user": buy["user"],
+            "sell_user": sell["user"],
+            "amount": amount,
+            "price": sell["price"],
+            "timestamp": time.time(),
+            "type": "token"
+        }
+        trades.append(trade)
+
+        try:
+            tx = {
+                "username": sell["user"],
+                "to": buy["user"],
+                "amount": amount
+            }
+            r = SESSION.post(WALLET_URL, json=tx, timeout=HTTP_TIMEOUT)
+            trade["blockchain_result"] = r.json()
+        except Exception as e:
+            trade["blockchain_result"] = {"error": str(e)}
 
-    for buy in list(orderbook["buy"]):
-        for sell in list(orderbook["sell"]):
-            if buy["price"] >= sell["price"] and buy["amount"] == sell["amount"]:
-                trade = {
-                    "buy_user": buy["user"],
-                    "sell_user": sell["user"],
-                    "amount": buy["amount"],
-                    "price": sell["price"],
-                    "timestamp": time.time(),
-                    "type": "token"
-                }
-                trades.append(trade)
-
-                try:
-                    tx = {
-                        "username": sell["user"],
-                        "to": buy["user"],
-                        "amount": buy["amount"]
-                    }
-                    r = requests.post(WALLET_URL, json=tx)
-                    trade["blockchain_result"] = r.json()
-                except Exception as e:
-                    trade["blockchain_result"] = {"error": str(e)}
-
-                orderbook["buy"].remove(buy)
-                orderbook["sell"].remove(sell)
-                break
+        # Ejecución parcial: el resto sigue en cabeza con la misma prioridad
+        buy["amount"] -= amount
+        sell["amount"] -= amount
+        if buy["amount"] == 0:
+            pop_best_order(buys)
+        if sell["amount"] == 0:
+            pop_best_order(sells)
 
 # -------------------------------
 # Motor de emparejamiento (coleccionables)
 # -------------------------------
-def match_collectible_orders():
+def match_collectible_orders(cid):
     global orderbook, trades
+    buys = orderbook["collectible_buy"].get(cid, SortedDict())
+    sells = orderbook["collectible_sell"].get(cid, SortedDict())
+
+    while True:
+        buy, sell = best_order(buys), best_order(sells)
+        if buy is None or sell is None or buy["price"] < sell["price"]:
+            break
+        pop_best_order(buys)
+        pop_best_order(sells)
+        trade = {
+            "buy_user": buy["user"],
+            "sell_user": sell["user"],
+            "collectible_id": cid,
+            "price": sell["price"],
+            "timestamp": time.time(),
+            "type": "collectible"
+        }
+        trades.append(trade)
+
+        try:
+            payload = {
+                "from": sell["user"],
+                "to": buy["user"],
+                "id": cid
+            }
+            r = SESSION.post(f"{COLLECTIBLE_URL}/collectible/transfer", json=payload, timeout=HTTP_TIMEOUT)
+            trade["blockchain_result"] = r.json()
+        except Exception as e:
+            trade["blockchain_result"] = {"error": str(e)}
 
-    for buy in list(orderbook["collectible_buy"]):
-        for sell in list(orderbook["collectible_sell"]):
-            if buy["collectible_id"] == sell["collectible_id"] and buy["price"] >= sell["price"]:
-                trade = {
-                    "buy_user": buy["user"],
-                    "sell_user": sell["user"],
-                    "collectible_id": buy["collectible_id"],
-                    "price": sell["price"],
-                    "timestamp": time.time(),
-                    "type": "collectible"
-                }
-                trades.append(trade)
-
-                try:
-                    payload = {
-                        "from": sell["user"],
-                        "to": buy["user"],
-                        "id": buy["collectible_id"]
-                    }
-                    r = requests.post(f"{COLLECTIBLE_URL}/collectible/transfer", json=payload)
-                    trade["blockchain_result"] = r.json()
-                except Exception as e:
-                    trade["blockchain_result"] = {"error": str(e)}
-
-                orderbook["collectible_buy"].remove(buy)
-                orderbook["collectible_sell"].remove(sell)
-                break
+    # No dejar libros vacíos en el índice por coleccionable
+    for order_type in ("collectible_buy", "collectible_sell"):
+        if cid in orderbook[order_type] and not orderbook[order_type][cid]:
+            del orderbook[order_type][cid]
 
 # -------------------------------
 # Arranque del servidor (Render)
@@ -1,11 +1,14 @@
 import os
-import json
+import functools
 import hashlib
 import secrets
 import requests
 import time
 from typing import Dict, Any
+import orjson
 from ecdsa import SigningKey, SECP256k1
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import Flask, request, jsonify
 
 # -------------------------------
@@ -15,31 +18,51 @@ DATA_DIR = "."
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 COLLECTIBLES_FILE = os.path.join(DATA_DIR, "collectibles.json")
 CORE_URL = os.environ.get("CORE_URL", "http://127.0.0.1:5000")  # Se ajusta en Render
+HTTP_TIMEOUT = (3.05, 10)  # (conexión, lectura) en segundos
 
-WORDLIST = [
+# 32 palabras (potencia de 2): cada palabra consume exactamente 5 bits de entropía
+WORDLIST = (
     "cactus","river","moon","light","echo","stone","forest","rapid","silver","delta","vapor","matrix",
     "ember","tropic","saffron","quartz","lumen","fenix","aurora","bridge","pixel","drift","nova",
-    "liber","origin","vault","chain","genesis","crypto"
-]
+    "liber","origin","vault","chain","genesis","crypto","orbit","prism","zenith"
+)
 
 def generate_mnemonic(n: int = 12) -> str:
-    return " ".join(secrets.choice(WORDLIST) for _ in range(n))
+    # Una sola lectura de entropía para toda la frase, sin sesgo de módulo
+    bits = int.from_bytes(secrets.token_bytes((5 * n + 7) // 8), "big")
+    return " ".join(WORDLIST[(bits >> (5 * i)) & 0x1f] for i in range(n))
 
 def load_json(path: str, default):
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except Exception:
-            return default
-    return default
+    # Un solo open: si no existe (FileNotFoundError es un OSError) o está corrupto, default
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return default
 
 def save_json(path: str, data):
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+# hashlib delega en OpenSSL, que ya usa SHA-NI/AVX2 cuando la CPU lo soporta
+_sha256 = hashlib.sha256
+
+def sha256(data: bytes) -> bytes:
+    return _sha256(data).digest()
 
 def address_from_pubkey_bytes(pubkey_bytes: bytes) -> str:
-    return hashlib.sha256(pubkey_bytes).hexdigest()
+    return sha256(pubkey_bytes).hex()
+
+def make_session() -> requests.Session:
+    # Conexiones persistentes al core; solo se reintentan fallos de conexión
+    retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.1)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+SESSION = make_session()
 
 # -------------------------------
 # Clase Wallet
@@ -47,7 +70,7 @@ def address_from_pubkey_bytes(pubkey_bytes: bytes) -> str:
 class Wallet:
     def __init__(self, mnemonic: str = None):
         self.mnemonic = mnemonic or generate_mnemonic(12)
-        seed = hashlib.sha256(self.mnemonic.encode()).digest()
+        seed = sha256(self.mnemonic.encode())
         self.private_key = SigningKey.from_string(seed, curve=SECP256k1)
         self.public_key = self.private_key.get_verifying_key()
         self.address = address_from_pubkey_bytes(self.public_key.to_string())
@@ -73,13 +96,18 @@ collectibles: Dict[str, Dict[str, Any]] = load_json(COLLECTIBLES_FILE, {})
 def ensure_username_available(username: str) -> bool:
     return username not in users
 
+@functools.lru_cache(maxsize=1024)
+def wallet_from_mnemonic(mnemonic: str, address: str = None) -> Wallet:
+    # Cacheado: derivar la clave pública es una multiplicación escalar SECP256k1
+    w = Wallet(mnemonic=mnemonic)
+    w.address = address or w.address
+    return w
+
 def get_wallet_by_username(username: str) -> Wallet:
     data = users.get(username)
     if not data or "mnemonic" not in data:
         return None
-    w = Wallet(mnemonic=data["mnemonic"])
-    w.address = data.get("address", w.address)
-    return w
+    return wallet_from_mnemonic(data["mnemonic"], data.get("address"))
 
 # -------------------------------
 # Servidor Flask
@@ -161,7 +189,7 @@ def send_tx():
     }
 
     try:
-        r = requests.post(f"{CORE_URL}/transaction", json=tx, timeout=10)
+        r = SESSION.post(f"{CORE_URL}/transaction", json=tx, timeout=HTTP_TIMEOUT)
         return jsonify(r.json()), r.status_code
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error conectando al core: {str(e)}"}), 502